@@ -1,6 +1,6 @@
 import streamlit as st
 import pandas as pd
-from dataset import df, analise_solicitacao, analise_categoria, top_clientes
+from dataset import df, analise_solicitacao, analise_categoria, top_clientes, rastreadores
 
 st.set_page_config(layout='wide', page_title='Análise Stay - Dashboard')
 
@@ -46,7 +46,7 @@ with aba1:
         st.dataframe(analise_solicitacao.sort_values('Total_Demandas', ascending=False))
     
     with col2:
-        st.bar_chart(analise_solicitacao.set_index('Tipo de Solicitação')['Total_Demandas'].head(10))
+        st.bar_chart(rastreadores['Tipo de Solicitação'].top(10).set_index('Item')['Contagem'].rename('Total_Demandas'))
 
 with aba2:
     st.subheader("Análise por Categoria")
@@ -56,7 +56,7 @@ with aba2:
         st.dataframe(analise_categoria.sort_values('Total_Demandas', ascending=False))
     
     with col2:
-        st.bar_chart(analise_categoria.set_index('Categoria 1')['Total_Demandas'].head(10))
+        st.bar_chart(rastreadores['Categoria 1'].top(10).set_index('Item')['Contagem'].rename('Total_Demandas'))
 
 with aba3:
     st.subheader("Top 20 Clientes com Mais Demandas")
@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import sqlite3
+from contextlib import contextmanager
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+from utils import assinatura_df
+
+# Backend opcional: STAY_BACKEND=sqlite ativa as consultas em SQLite
+USAR_SQLITE = os.environ.get('STAY_BACKEND', 'pandas').lower() == 'sqlite'
+CAMINHO_BANCO = os.environ.get('STAY_BANCO_SQLITE', 'dados/stay.sqlite')
+
+# Limpeza de tabelas antigas: mantém as mais usadas recentemente e nunca
+# remove uma tabela usada há menos de RETENCAO_MINIMA segundos
+MAX_TABELAS = int(os.environ.get('STAY_SQLITE_MAX_TABELAS', '20'))
+RETENCAO_MINIMA = int(os.environ.get('STAY_SQLITE_RETENCAO', '3600'))
+
+AGREGACOES = {
+    'sum': 'SUM({})',
+    'count': 'COUNT({})',
+    'mean': 'AVG({})',
+    'min': 'MIN({})',
+    'max': 'MAX({})',
+    'nunique': 'COUNT(DISTINCT {})',
+}
+
+
+# Conexão em modo autocommit; gravações abrem a transação explicitamente
+@contextmanager
+def conectar(caminho=CAMINHO_BANCO):
+    conexao = sqlite3.connect(caminho, timeout=30, isolation_level=None)
+    try:
+        conexao.execute('PRAGMA journal_mode=WAL')
+        conexao.execute(
+            'CREATE TABLE IF NOT EXISTS _tabelas '
+            '(tabela TEXT PRIMARY KEY, colunas_data TEXT, usado_em REAL)'
+        )
+        yield conexao
+    finally:
+        conexao.close()
+
+
+def _nome(identificador):
+    return '"' + str(identificador).replace('"', '""') + '"'
+
+
+def _valor(valor):
+    return valor.item() if isinstance(valor, np.generic) else valor
+
+
+def _linhas(df):
+    # Datas viram texto ISO (ordenável e comparável no SQL); nulos viram NULL
+    dados = df.rename_axis('_linha').reset_index()
+    for col in dados.columns:
+        if pd.api.types.is_datetime64_any_dtype(dados[col]):
+            dados[col] = dados[col].dt.strftime('%Y-%m-%d %H:%M:%S')
+    dados = dados.astype(object).where(dados.notna(), None)
+    return dados.itertuples(index=False, name=None)
+
+
+# Grava o DataFrame em uma tabela identificada pelo conteúdo (prefixo + assinatura),
+# com índices nas colunas de filtro/agrupamento. A verificação e a gravação
+# acontecem na mesma transação (BEGIN IMMEDIATE), então processos que carregam
+# o mesmo arquivo ao mesmo tempo gravam a tabela uma única vez.
+def carregar_tabela(prefixo, df, colunas_indice=(), assinatura=None, caminho=CAMINHO_BANCO):
+    tabela = f'{prefixo}_{assinatura or assinatura_df(df)}'
+    with conectar(caminho) as conexao:
+        conexao.execute('BEGIN IMMEDIATE')
+        try:
+            if not conexao.execute('SELECT 1 FROM _tabelas WHERE tabela = ?', (tabela,)).fetchone():
+                # Tabela sem registro (sobra de uma gravação antiga) é refeita
+                conexao.execute(f'DROP TABLE IF EXISTS {_nome(tabela)}')
+                esquema = pd.io.sql.get_schema(df.rename_axis('_linha').reset_index(), tabela, con=conexao)
+                conexao.execute(esquema)
+                marcadores = ', '.join('?' * (len(df.columns) + 1))
+                conexao.executemany(f'INSERT INTO {_nome(tabela)} VALUES ({marcadores})', _linhas(df))
+                for col in colunas_indice:
+                    if col in df.columns:
+                        conexao.execute(f'CREATE INDEX {_nome(tabela + "_" + col)} ON {_nome(tabela)} ({_nome(col)})')
+                colunas_data = [col for col in df.columns if pd.api.types.is_datetime64_any_dtype(df[col])]
+                conexao.execute('INSERT INTO _tabelas VALUES (?, ?, ?)', (tabela, json.dumps(colunas_data), time.time()))
+            else:
+                conexao.execute('UPDATE _tabelas SET usado_em = ? WHERE tabela = ?', (time.time(), tabela))
+            _remover_antigas(conexao, tabela)
+            conexao.execute('COMMIT')
+        except BaseException:
+            conexao.execute('ROLLBACK')
+            raise
+    return tabela
+
+
+def _remover_antigas(conexao, atual):
+    antigas = conexao.execute(
+        'SELECT tabela FROM _tabelas WHERE tabela != ? AND usado_em < ? '
+        'ORDER BY usado_em DESC LIMIT -1 OFFSET ?',
+        (atual, time.time() - RETENCAO_MINIMA, max(MAX_TABELAS - 1, 0))
+    ).fetchall()
+    for (tabela,) in antigas:
+        conexao.execute(f'DROP TABLE IF EXISTS {_nome(tabela)}')
+        conexao.execute('DELETE FROM _tabelas WHERE tabela = ?', (tabela,))
+
+
+# Marca a tabela como usada (adia a limpeza); False se ela já foi removida
+def usar_tabela(tabela, caminho=CAMINHO_BANCO):
+    with conectar(caminho) as conexao:
+        cursor = conexao.execute('UPDATE _tabelas SET usado_em = ? WHERE tabela = ?', (time.time(), tabela))
+        return cursor.rowcount > 0
+
+
+def colunas_tabela(tabela, caminho=CAMINHO_BANCO):
+    with conectar(caminho) as conexao:
+        colunas = [linha[1] for linha in conexao.execute(f'PRAGMA table_info({_nome(tabela)})')]
+    return [col for col in colunas if col != '_linha']
+
+
+# Filtros no formato {coluna: valor}:
+# - tupla (min, max): intervalo (datas comparadas pelo dia)
+# - lista/conjunto/array: pertinência
+# - outro valor: igualdade
+def montar_filtros(filtros):
+    condicoes = []
+    parametros = []
+    for col, valor in (filtros or {}).items():
+        if isinstance(valor, tuple):
+            inicio, fim = valor
+            if isinstance(inicio, date):
+                # Datas gravadas como texto ISO: intervalo semiaberto aproveita o índice
+                condicoes.append(f'{_nome(col)} >= ? AND {_nome(col)} < ?')
+                parametros += [inicio.isoformat(), (fim + timedelta(days=1)).isoformat()]
+            else:
+                condicoes.append(f'{_nome(col)} BETWEEN ? AND ?')
+                parametros += [_valor(inicio), _valor(fim)]
+        elif isinstance(valor, (list, set)) or hasattr(valor, 'tolist'):
+            # Lista passada como um único parâmetro JSON, sem limite de variáveis
+            valores = valor.tolist() if hasattr(valor, 'tolist') else list(valor)
+            condicoes.append(f'{_nome(col)} IN (SELECT value FROM json_each(?))')
+            parametros.append(json.dumps(valores, default=str))
+        else:
+            condicoes.append(f'{_nome(col)} = ?')
+            parametros.append(_valor(valor))
+    if not condicoes:
+        return '', []
+    return ' WHERE ' + ' AND '.join(condicoes), parametros
+
+
+def _colunas_data(conexao, tabela):
+    linha = conexao.execute('SELECT colunas_data FROM _tabelas WHERE tabela = ?', (tabela,)).fetchone()
+    return json.loads(linha[0]) if linha else []
+
+
+# Linhas filtradas, opcionalmente paginadas (limite/deslocamento)
+def consultar(tabela, filtros=None, colunas=None, ordenar_por=None, limite=None, deslocamento=0, caminho=CAMINHO_BANCO):
+    selecao = ', '.join(_nome(col) for col in ['_linha'] + list(colunas)) if colunas is not None else '*'
+    where, parametros = montar_filtros(filtros)
+    sql = f'SELECT {selecao} FROM {_nome(tabela)}{where}'
+    sql += f' ORDER BY {_nome(ordenar_por or "_linha")}'
+    if limite:
+        sql += f' LIMIT {int(limite)} OFFSET {int(deslocamento)}'
+    with conectar(caminho) as conexao:
+        colunas_data = _colunas_data(conexao, tabela)
+        resultado = pd.read_sql_query(sql, conexao, params=parametros)
+    for col in colunas_data:
+        if col in resultado.columns:
+            resultado[col] = pd.to_datetime(resultado[col])
+    resultado = resultado.set_index('_linha')
+    resultado.index.name = None
+    return resultado
+
+
+def contar(tabela, filtros=None, caminho=CAMINHO_BANCO):
+    where, parametros = montar_filtros(filtros)
+    with conectar(caminho) as conexao:
+        return conexao.execute(f'SELECT COUNT(*) FROM {_nome(tabela)}{where}', parametros).fetchone()[0]
+
+
+def valores_distintos(tabela, coluna, filtros=None, caminho=CAMINHO_BANCO):
+    where, parametros = montar_filtros(filtros)
+    sql = f'SELECT DISTINCT {_nome(coluna)} FROM {_nome(tabela)}{where}'
+    with conectar(caminho) as conexao:
+        return [linha[0] for linha in conexao.execute(sql, parametros)]
+
+
+# Agregações no formato {nome_resultado: (funcao, coluna)}, com funcao em AGREGACOES.
+# Sem colunas de agrupamento, devolve uma única linha com os totais.
+def agregar(tabela, agrupar_por, agregacoes, filtros=None, ordenar_por=None, decrescente=True, limite=None, caminho=CAMINHO_BANCO):
+    expressoes = []
+    for nome, (funcao, col) in agregacoes.items():
+        if funcao not in AGREGACOES:
+            raise ValueError(f'Agregação não suportada: {funcao}')
+        expressoes.append(f'{AGREGACOES[funcao].format(_nome(col))} AS {_nome(nome)}')
+
+    where, parametros = montar_filtros(filtros)
+    if agrupar_por:
+        grupos = ', '.join(_nome(col) for col in agrupar_por)
+        # Assim como no groupby do pandas, grupos nulos são descartados
+        nao_nulos = ' AND '.join(f'{_nome(col)} IS NOT NULL' for col in agrupar_por)
+        where = f'{where} AND {nao_nulos}' if where else f' WHERE {nao_nulos}'
+        sql = f'SELECT {grupos}, {", ".join(expressoes)} FROM {_nome(tabela)}{where} GROUP BY {grupos}'
+    else:
+        sql = f'SELECT {", ".join(expressoes)} FROM {_nome(tabela)}{where}'
+    if ordenar_por:
+        # Empates desfeitos pelos grupos comparados como texto (mesma ordem do FontePandas)
+        desempate = ''.join(f', CAST({_nome(col)} AS TEXT)' for col in agrupar_por or [] if col != ordenar_por)
+        sql += f' ORDER BY {_nome(ordenar_por)} {"DESC" if decrescente else "ASC"}{desempate}'
+    if limite:
+        sql += f' LIMIT {int(limite)}'
+    with conectar(caminho) as conexao:
+        return pd.read_sql_query(sql, conexao, params=parametros)
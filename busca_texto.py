@@ -0,0 +1,74 @@
+from bisect import bisect_left
+import numpy as np
+import pandas as pd
+from indice_nomes import normalizar_nome, MARCAS_COMBINANTES, SEPARADORES
+
+# Colunas de texto livre indexadas na base de atendimentos
+COLUNAS_BUSCA = ['Descrição', 'Solução']
+
+
+# Mesmos passos de normalizar_nome (usada nas consultas), vetorizados para
+# colunas de texto longo: índice e consulta geram sempre os mesmos termos
+def normalizar_textos(serie):
+    return (
+        serie.astype(str)
+        .str.normalize('NFKD')
+        .str.replace(MARCAS_COMBINANTES, '', regex=True)
+        .str.casefold()
+        .str.replace(SEPARADORES, ' ', regex=True)
+        .str.strip()
+    )
+
+
+# Índice invertido (termo -> posições das linhas) montado uma vez por base.
+# Os termos são normalizados sem acentos e sem diferença de caixa; a consulta
+# exige todos os termos e o último é tratado como prefixo (busca enquanto digita).
+class IndiceTexto:
+    def __init__(self, df, colunas=COLUNAS_BUSCA):
+        self.rotulos = df.index
+
+        # Termos de cada linha (união das colunas), normalizando cada texto distinto uma vez
+        termos_linhas = [set() for _ in range(len(df))]
+        for col in colunas:
+            if col not in df.columns:
+                continue
+            codigos, textos = pd.factorize(df[col])
+            termos_textos = normalizar_textos(pd.Series(textos)).str.split().tolist()
+            for termos, codigo in zip(termos_linhas, codigos):
+                if codigo >= 0:
+                    termos.update(termos_textos[codigo])
+
+        postagens = {}
+        for posicao, termos in enumerate(termos_linhas):
+            for termo in termos:
+                postagens.setdefault(termo, []).append(posicao)
+        self.postagens = {termo: np.array(posicoes, dtype=np.int64) for termo, posicoes in postagens.items()}
+        self.vocabulario = sorted(self.postagens)
+
+    def buscar(self, consulta):
+        termos = normalizar_nome(consulta).split()
+        if not termos:
+            return self.rotulos
+
+        resultado = None
+        for i, termo in enumerate(termos):
+            if i == len(termos) - 1:
+                posicoes = self._postagens_prefixo(termo)
+            else:
+                posicoes = self.postagens.get(termo, np.empty(0, dtype=np.int64))
+            resultado = posicoes if resultado is None else np.intersect1d(resultado, posicoes, assume_unique=True)
+            if len(resultado) == 0:
+                break
+        return self.rotulos[resultado]
+
+    def _postagens_prefixo(self, prefixo):
+        listas = []
+        i = bisect_left(self.vocabulario, prefixo)
+        while i < len(self.vocabulario) and self.vocabulario[i].startswith(prefixo):
+            listas.append(self.postagens[self.vocabulario[i]])
+            i += 1
+        if not listas:
+            return np.empty(0, dtype=np.int64)
+        if len(listas) == 1:
+            return listas[0]
+        return np.unique(np.concatenate(listas))
@@ -1,36 +1,82 @@
 import pandas as pd
+from rastreador_top import criar_rastreadores
+from indice_nomes import IndiceNomes
+from backend_sqlite import USAR_SQLITE, carregar_tabela, agregar, usar_tabela
+from fonte_dados import FontePandas, FonteSQLite
+from utils import assinatura_df
 
 # Lendo o arquivo CSV com separador correto
 df = pd.read_csv('dados/Recorrência de Demandas.csv', sep=';', encoding='utf-8')
 
 # Limpeza e processamento dos dados
 df['QTD. No Periodo'] = pd.to_numeric(df['QTD. No Periodo'], errors='coerce')
+assinatura_recorrencia = assinatura_df(df)
+
+# Índice de nomes dos clientes (chaves estáveis para cruzar com as outras bases)
+indice_clientes = IndiceNomes()
+chaves_clientes = indice_clientes.chaves_serie(df['Cliente'])
+
+# Índice de nomes dos agentes a partir do log do Omnidesk; cada upload de
+# atendimentos parte de uma cópia dele, mantendo as chaves dos agentes conhecidos
+indice_agentes = IndiceNomes()
+try:
+    indice_agentes.chaves_serie(
+        pd.read_csv('dados/Acompanhamento de Atendentes - Omnidesk.csv', sep=';', usecols=['Usuario'])['Usuario']
+    )
+except (FileNotFoundError, ValueError):
+    pass
+
+# Com o backend SQLite ativo, os agrupamentos são feitos no banco
+COLUNAS_INDICE_RECORRENCIA = ['Cliente', 'Tipo de Solicitação', 'Categoria 1', 'Matriz', 'QTD. No Periodo']
+
+def carregar_recorrencia():
+    return carregar_tabela(
+        'recorrencia', df, colunas_indice=COLUNAS_INDICE_RECORRENCIA, assinatura=assinatura_recorrencia
+    )
+
+tabela_recorrencia = carregar_recorrencia() if USAR_SQLITE else None
+
+# Fonte dos dados padrão para as páginas; a tabela é gravada de novo se a
+# limpeza do banco a tiver removido
+def fonte_recorrencia():
+    if not tabela_recorrencia:
+        return FontePandas(df)
+    if not usar_tabela(tabela_recorrencia):
+        carregar_recorrencia()
+    return FonteSQLite(tabela_recorrencia)
+
+def analise_por(coluna):
+    if tabela_recorrencia:
+        analise = agregar(tabela_recorrencia, [coluna], {
+            'Total_Demandas': ('sum', 'QTD. No Periodo'),
+            'Num_Clientes': ('count', 'QTD. No Periodo'),
+            'Media_Por_Cliente': ('mean', 'QTD. No Periodo')
+        }, ordenar_por=coluna, decrescente=False)
+        return analise.round(2)
+    analise = df.groupby(coluna).agg({
+        'QTD. No Periodo': ['sum', 'count', 'mean']
+    }).round(2)
+    analise.columns = ['Total_Demandas', 'Num_Clientes', 'Media_Por_Cliente']
+    return analise.reset_index()
 
 # Análise por tipo de solicitação
-analise_solicitacao = df.groupby('Tipo de Solicitação').agg({
-    'QTD. No Periodo': ['sum', 'count', 'mean']
-}).round(2)
-analise_solicitacao.columns = ['Total_Demandas', 'Num_Clientes', 'Media_Por_Cliente']
-analise_solicitacao = analise_solicitacao.reset_index()
+analise_solicitacao = analise_por('Tipo de Solicitação')
 
 # Análise por categoria
-analise_categoria = df.groupby('Categoria 1').agg({
-    'QTD. No Periodo': ['sum', 'count', 'mean']
-}).round(2)
-analise_categoria.columns = ['Total_Demandas', 'Num_Clientes', 'Media_Por_Cliente']
-analise_categoria = analise_categoria.reset_index()
+analise_categoria = analise_por('Categoria 1')
 
 # Análise por matriz
-analise_matriz = df.groupby('Matriz').agg({
-    'QTD. No Periodo': ['sum', 'count', 'mean']
-}).round(2)
-analise_matriz.columns = ['Total_Demandas', 'Num_Clientes', 'Media_Por_Cliente']
-analise_matriz = analise_matriz.reset_index()
-
-# Top clientes com mais demandas (agrupando por cliente)
-top_clientes_agrupado = df.groupby('Cliente').agg({
-    'QTD. No Periodo': 'sum',
+analise_matriz = analise_por('Matriz')
+
+# Rastreadores dos itens mais frequentes por dimensão (ponderados pela quantidade)
+rastreadores = criar_rastreadores(df, coluna_peso='QTD. No Periodo')
+
+# Top clientes com mais demandas (lidos do rastreador, detalhando só os clientes do topo)
+top_clientes = rastreadores['Cliente'].top(20).rename(columns={'Item': 'Cliente', 'Contagem': 'QTD. No Periodo'})
+top_clientes_detalhes = df[df['Cliente'].isin(top_clientes['Cliente'])].groupby('Cliente').agg({
     'Tipo de Solicitação': lambda x: ', '.join(x.unique()),
     'Categoria 1': lambda x: ', '.join(x.unique())
 }).reset_index()
-top_clientes = top_clientes_agrupado.nlargest(20, 'QTD. No Periodo')
\ No newline at end of file
+top_clientes = top_clientes.merge(top_clientes_detalhes, on='Cliente')[
+    ['Cliente', 'QTD. No Periodo', 'Tipo de Solicitação', 'Categoria 1', 'Erro_Maximo']
+]
\ No newline at end of file
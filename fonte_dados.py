@@ -0,0 +1,94 @@
+from datetime import date
+import pandas as pd
+from backend_sqlite import usar_tabela, colunas_tabela, consultar, contar, valores_distintos, agregar
+
+# Linhas por página na tabela de dados filtrados quando os dados estão no SQLite
+TAMANHO_PAGINA = 1000
+
+
+# Mesma interface sobre um DataFrame em memória (FontePandas) ou sobre uma
+# tabela já carregada no SQLite (FonteSQLite). As páginas pedem só contagens,
+# agregações, valores distintos e páginas de linhas; os filtros seguem o
+# formato de backend_sqlite.montar_filtros.
+class FontePandas:
+    tamanho_pagina = None
+
+    def __init__(self, df):
+        self.df = df
+        self.colunas = list(df.columns)
+
+    def disponivel(self):
+        return True
+
+    def filtrar(self, filtros=None):
+        dados = self.df
+        for col, valor in (filtros or {}).items():
+            serie = dados[col]
+            if isinstance(valor, tuple):
+                inicio, fim = valor
+                if isinstance(inicio, date):
+                    serie = serie.dt.date
+                dados = dados[(serie >= inicio) & (serie <= fim)]
+            elif isinstance(valor, (list, set)) or hasattr(valor, 'tolist'):
+                dados = dados[serie.isin(valor)]
+            else:
+                dados = dados[serie == valor]
+        return dados
+
+    def contar(self, filtros=None):
+        return len(self.filtrar(filtros))
+
+    def distintos(self, coluna, filtros=None):
+        return list(self.filtrar(filtros)[coluna].unique())
+
+    def agregar(self, agrupar_por, agregacoes, filtros=None, ordenar_por=None, decrescente=True, limite=None):
+        dados = self.filtrar(filtros)
+        if agrupar_por:
+            resultado = dados.groupby(list(agrupar_por)).agg(
+                **{nome: (col, funcao) for nome, (funcao, col) in agregacoes.items()}
+            ).reset_index()
+        else:
+            resultado = pd.DataFrame({nome: [dados[col].agg(funcao)] for nome, (funcao, col) in agregacoes.items()})
+        if ordenar_por:
+            # Empates desfeitos pelos grupos comparados como texto (mesma ordem do SQLite)
+            desempate = [col for col in agrupar_por or [] if col != ordenar_por]
+            resultado = resultado.sort_values(
+                [ordenar_por] + desempate,
+                ascending=[not decrescente] + [True] * len(desempate),
+                key=lambda serie: serie.astype(str) if serie.name in desempate else serie,
+                kind='stable'
+            )
+        if limite:
+            resultado = resultado.head(limite)
+        return resultado.reset_index(drop=True)
+
+    def linhas(self, filtros=None, colunas=None, limite=None, deslocamento=0):
+        dados = self.filtrar(filtros)
+        if colunas is not None:
+            dados = dados[colunas]
+        if limite:
+            dados = dados.iloc[deslocamento:deslocamento + limite]
+        return dados
+
+
+class FonteSQLite:
+    tamanho_pagina = TAMANHO_PAGINA
+
+    def __init__(self, tabela):
+        self.tabela = tabela
+        self.colunas = colunas_tabela(tabela)
+
+    def disponivel(self):
+        return usar_tabela(self.tabela)
+
+    def contar(self, filtros=None):
+        return contar(self.tabela, filtros)
+
+    def distintos(self, coluna, filtros=None):
+        return valores_distintos(self.tabela, coluna, filtros)
+
+    def agregar(self, agrupar_por, agregacoes, filtros=None, ordenar_por=None, decrescente=True, limite=None):
+        return agregar(self.tabela, agrupar_por, agregacoes, filtros, ordenar_por, decrescente, limite)
+
+    def linhas(self, filtros=None, colunas=None, limite=None, deslocamento=0):
+        return consultar(self.tabela, filtros, colunas, limite=limite, deslocamento=deslocamento)
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.io as pio
+import streamlit as st
+
+
+# Figuras memorizadas em JSON pela assinatura dos dados + estado dos filtros.
+# A tabela agregada e a figura só são montadas quando a chave muda; reruns
+# causados por outros widgets reaproveitam o JSON já pronto.
+@st.cache_data(show_spinner=False, max_entries=256)
+def _figura_json(nome, assinatura, estado, _montar):
+    return _montar().to_json()
+
+def figura_cacheada(nome, assinatura, estado, montar):
+    return pio.from_json(_figura_json(nome, assinatura, estado, montar))
+
+
+# Gráficos montados a partir de tabelas pequenas já agregadas
+
+def barras_horizontais(serie, **layout):
+    # Montado a partir de um DataFrame: aceita série vazia (ex.: busca sem resultados)
+    tabela = pd.DataFrame({'x': serie.to_numpy(), 'y': serie.index})
+    fig = px.bar(tabela, x='x', y='y', orientation='h', title=layout.pop('title', None))
+    if layout:
+        fig.update_layout(**layout)
+    return fig
+
+def pizza(serie, title=None):
+    return px.pie(values=serie.values, names=serie.index, title=title)
+
+def barras_empilhadas(tabela, x, y, cor, **layout):
+    fig = px.bar(tabela, x=x, y=y, color=cor, title=layout.pop('title', None))
+    if layout:
+        fig.update_layout(**layout)
+    return fig
+
+# Contagem por faixas (substitui o histograma sobre as linhas brutas)
+def contagem_por_faixas(serie, nbins=10):
+    valores = pd.to_numeric(serie, errors='coerce').dropna()
+    contagens, limites = np.histogram(valores, bins=nbins)
+    return pd.DataFrame({
+        'Inicio': limites[:-1],
+        'Fim': limites[1:],
+        'Total': contagens
+    })
+
+def histograma_faixas(faixas, titulo_x=None):
+    fig = px.bar(
+        x=(faixas['Inicio'] + faixas['Fim']) / 2,
+        y=faixas['Total'],
+        hover_data={'Início': faixas['Inicio'], 'Fim': faixas['Fim']}
+    )
+    fig.update_traces(width=(faixas['Fim'] - faixas['Inicio']).tolist())
+    fig.update_layout(bargap=0, xaxis_title=titulo_x, yaxis_title='count')
+    return fig
@@ -0,0 +1,102 @@
+import re
+import copy
+import unicodedata
+from difflib import SequenceMatcher
+import pandas as pd
+
+# Marcas combinantes (acentos) separadas pela decomposição NFKD e caracteres
+# que viram separador; compartilhados com a normalização vetorizada da busca
+MARCAS_COMBINANTES = '[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]'
+SEPARADORES = r'[^0-9a-z]+'
+
+# Partículas ignoradas na comparação e na formação dos blocos
+PARTICULAS = {'de', 'da', 'do', 'das', 'dos', 'e'}
+
+
+def normalizar_nome(nome):
+    if pd.isna(nome):
+        return ''
+    texto = re.sub(MARCAS_COMBINANTES, '', unicodedata.normalize('NFKD', str(nome)))
+    texto = re.sub(SEPARADORES, ' ', texto.casefold())
+    return texto.strip()
+
+
+# Índice que associa variações de um mesmo nome (acentos, caixa, espaços e
+# pequenas diferenças de digitação) a uma chave inteira estável. A comparação
+# aproximada só é feita dentro dos blocos (início do primeiro e do último nome),
+# evitando comparar todos os nomes entre si.
+class IndiceNomes:
+    def __init__(self, limiar=0.95):
+        self.limiar = limiar
+        self.chaves = {}
+        self.nomes = []
+        self.blocos = {}
+
+    def __len__(self):
+        return len(self.nomes)
+
+    def chave(self, nome, inserir=True):
+        normalizado = normalizar_nome(nome)
+        if not normalizado:
+            return -1
+        if normalizado in self.chaves:
+            return self.chaves[normalizado]
+
+        candidatos = set()
+        for bloco in self._blocos(normalizado):
+            candidatos.update(self.blocos.get(bloco, ()))
+
+        chave = -1
+        melhor = self.limiar
+        comparavel = self._comparavel(normalizado)
+        for candidato in candidatos:
+            # Nomes com quantidade diferente de partes são tratados como pessoas distintas
+            if len(self._comparavel(candidato).split()) != len(comparavel.split()):
+                continue
+            comparador = SequenceMatcher(None, comparavel, self._comparavel(candidato))
+            if comparador.real_quick_ratio() < melhor or comparador.quick_ratio() < melhor:
+                continue
+            similaridade = comparador.ratio()
+            if similaridade >= melhor:
+                chave, melhor = self.chaves[candidato], similaridade
+
+        if not inserir:
+            return chave
+        if chave == -1:
+            chave = len(self.nomes)
+            self.nomes.append(nome)
+        self.chaves[normalizado] = chave
+        for bloco in self._blocos(normalizado):
+            self.blocos.setdefault(bloco, []).append(normalizado)
+        return chave
+
+    def chaves_serie(self, serie, inserir=True):
+        # Resolve cada valor distinto uma única vez
+        mapa = {valor: self.chave(valor, inserir) for valor in serie.dropna().unique()}
+        return serie.map(mapa).fillna(-1).astype('int64')
+
+    def copiar(self):
+        # Cópia independente: inserções na cópia não alteram o índice compartilhado
+        return copy.deepcopy(self)
+
+    def nome(self, chave):
+        return self.nomes[chave] if 0 <= chave < len(self.nomes) else None
+
+    def _comparavel(self, normalizado):
+        return ' '.join(t for t in normalizado.split() if t not in PARTICULAS)
+
+    def _blocos(self, normalizado):
+        # Pares de prefixos: um erro de digitação em um dos nomes ainda
+        # mantém o registro em pelo menos um bloco
+        tokens = [t[:3] for t in (self._comparavel(normalizado).split() or normalizado.split())]
+        if len(tokens) == 1:
+            return {(tokens[0],)}
+        meio = tokens[1] if len(tokens) > 2 else ''
+        return {(tokens[0], tokens[-1]), (tokens[0], meio), (meio, tokens[-1])}
+
+
+def contar_por_chave(chaves_base, chaves_outro, nome_coluna='Total'):
+    # Junta dois conjuntos pela chave: para cada registro da base, quantos
+    # registros do outro conjunto compartilham a mesma chave
+    contagem = chaves_outro[chaves_outro >= 0].value_counts()
+    return chaves_base.map(contagem).fillna(0).astype('int64').rename(nome_coluna)
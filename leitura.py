@@ -0,0 +1,12 @@
+import pandas as pd
+from io import BytesIO
+
+# Leitura de um arquivo enviado, executada nos processos auxiliares de
+# utils.carregar_arquivos: o módulo importa só o pandas (sem o streamlit)
+def ler_arquivo(nome, conteudo, opcoes_csv=None):
+    try:
+        if nome.endswith('.csv'):
+            return pd.read_csv(BytesIO(conteudo), **(opcoes_csv or {}))
+        return pd.read_excel(BytesIO(conteudo))
+    except Exception as e:
+        raise ValueError(f'{nome}: {e}') from e
@@ -1,15 +1,45 @@
 import streamlit as st
 import pandas as pd
 try:
-    import plotly.express as px
+    from graficos import figura_cacheada, barras_horizontais, contagem_por_faixas, histograma_faixas
 except ImportError:
     st.error("Plotly não está instalado. Execute: pip install plotly")
     st.stop()
-from utils import converter_csv, converter_excel, mensagem_sucesso
+from utils import converter_csv, converter_excel, mensagem_sucesso, carregar_arquivos, identificar_arquivos, assinatura_df
+from dataset import df as df_recorrencia, indice_clientes, chaves_clientes, indice_agentes
+from indice_nomes import contar_por_chave
+from busca_texto import IndiceTexto
 
 st.set_page_config(layout='wide', page_title='Atendimentos dos Agentes')
+
+# Colunas esperadas no arquivo de atendimentos (baseadas no arquivo atendimento-agentes.xlsx)
+COLUNAS_ATENDIMENTOS = [
+    'Atendente Criador', 'Atendente', 'ID Contrato', 'Protocolo', 'Cliente', 'Tipo Geral', 'Tipo Específico',
+    'Descrição', 'DT Abertura', 'DT Conclusão', 'Solução', 'Cidade', 'Bairro', 'Ponto de Acesso'
+]
+COLUNAS_REMOVER = ['Tipo Contrato', 'Contexto', 'Problema', 'Status', 'SLA']
+COLUNAS_DATA_ESPECIFICAS = ['DT Abertura', 'DT Conclusão']
 st.title('🎧 Análise de Atendimentos dos Agentes')
 
+# Colunas vazias (do esquema, ausentes no arquivo) são ignoradas; as de quem
+# abriu o chamado ("Criador") ficam depois das de quem atendeu
+def detectar_colunas_agente(df):
+    colunas = [col for col in df.columns if ('agente' in col.lower() or 'atendente' in col.lower()) and df[col].notna().any()]
+    return sorted(colunas, key=lambda col: 'criador' in col.lower())
+
+def detectar_colunas_data(df):
+    return [col for col in df.columns if any(palavra in col.lower() for palavra in ['data', 'date', 'dia', 'mes', 'ano', 'time', 'timestamp']) and df[col].notna().any()]
+
+# Preparação feita uma vez no upload: remove as colunas indesejadas e converte
+# todas as colunas que podem ser escolhidas como data, para que nada seja
+# convertido de novo a cada rerun
+def processar_atendimentos(df):
+    df = df.drop(columns=[col for col in COLUNAS_REMOVER if col in df.columns])
+    colunas_data = [col for col in COLUNAS_DATA_ESPECIFICAS if col in df.columns] + detectar_colunas_data(df)[:1]
+    for col in dict.fromkeys(colunas_data):
+        df[col] = pd.to_datetime(df[col], dayfirst=True, errors='coerce')
+    return df
+
 # Opção de fonte de dados
 data_source = st.radio(
     "Escolha a fonte dos dados:",
@@ -23,28 +53,62 @@ if data_source == "📁 Upload de arquivo":
     if st.button("🗑️ Limpar Dados Carregados"):
         if 'uploaded_data' in st.session_state:
             del st.session_state.uploaded_data
+        if 'uploaded_arquivos' in st.session_state:
+            del st.session_state.uploaded_arquivos
+        if 'uploaded_chaves_clientes' in st.session_state:
+            del st.session_state.uploaded_chaves_clientes
+        if 'uploaded_chaves_agentes' in st.session_state:
+            del st.session_state.uploaded_chaves_agentes
+        if 'uploaded_indice_agentes' in st.session_state:
+            del st.session_state.uploaded_indice_agentes
+        if 'uploaded_indice_busca' in st.session_state:
+            del st.session_state.uploaded_indice_busca
+        if 'uploaded_assinatura' in st.session_state:
+            del st.session_state.uploaded_assinatura
         st.rerun()
     
-    uploaded_file = st.file_uploader(
-        "Faça upload do arquivo de atendimentos (CSV ou Excel)", 
-        type=['csv', 'xlsx', 'xls']
+    uploaded_files = st.file_uploader(
+        "Faça upload dos arquivos de atendimentos (CSV ou Excel)", 
+        type=['csv', 'xlsx', 'xls'],
+        accept_multiple_files=True
     )
     
+    # Arquivos no uploader diferentes dos já carregados (um arquivo foi
+    # adicionado ou removido): os dados da sessão são recarregados
+    arquivos = identificar_arquivos(uploaded_files)
+    arquivos_novos = bool(uploaded_files) and arquivos != st.session_state.get('uploaded_arquivos')
+    
     # Verificar se já existe dados na sessão
-    if 'uploaded_data' in st.session_state:
+    if 'uploaded_data' in st.session_state and not arquivos_novos:
         df = st.session_state.uploaded_data
         st.success(f"Arquivo já carregado! {len(df)} registros encontrados.")
-    elif uploaded_file is not None:
+    elif uploaded_files:
         try:
-            # Carrega o arquivo
-            if uploaded_file.name.endswith('.csv'):
-                df = pd.read_csv(uploaded_file)
-            else:
-                df = pd.read_excel(uploaded_file)
+            # Carrega os arquivos (em paralelo quando há mais de um)
+            df = processar_atendimentos(carregar_arquivos(uploaded_files, colunas=COLUNAS_ATENDIMENTOS))
+            
+            # Monta o estado derivado antes de gravar qualquer chave na sessão,
+            # para que uma falha não deixe a sessão pela metade
+            chaves_clientes_upload = indice_clientes.chaves_serie(df['Cliente'], inserir=False) if 'Cliente' in df.columns else None
+            # Agentes: mesmas chaves do Omnidesk; agentes novos ganham chaves só nesta cópia
+            indice_agentes_upload = indice_agentes.copiar()
+            chaves_agentes_upload = pd.DataFrame(
+                {col: indice_agentes_upload.chaves_serie(df[col]) for col in detectar_colunas_agente(df)},
+                index=df.index
+            )
+            indice_busca = IndiceTexto(df)
+            assinatura_upload = assinatura_df(df)
             
             # Salvar na sessão
             st.session_state.uploaded_data = df
-            st.success(f"Arquivo carregado com sucesso! {len(df)} registros encontrados.")
+            if chaves_clientes_upload is not None:
+                st.session_state.uploaded_chaves_clientes = chaves_clientes_upload
+            st.session_state.uploaded_chaves_agentes = chaves_agentes_upload
+            st.session_state.uploaded_indice_agentes = indice_agentes_upload
+            st.session_state.uploaded_indice_busca = indice_busca
+            st.session_state.uploaded_assinatura = assinatura_upload
+            st.session_state.uploaded_arquivos = arquivos
+            st.success(f"{len(uploaded_files)} arquivo(s) carregado(s) com sucesso! {len(df)} registros encontrados.")
         except Exception as e:
             st.error(f"Erro ao processar o arquivo: {str(e)}")
             df = None
@@ -62,20 +126,20 @@ else:
     df = None
 
 if df is not None:
-    # Remover colunas indesejadas
-    colunas_remover = ['Tipo Contrato', 'Contexto', 'Problema', 'Status', 'SLA']
-    df = df.drop(columns=[col for col in colunas_remover if col in df.columns])
+    assinatura = st.session_state.uploaded_assinatura
+    
+    # Esta página trabalha sempre em memória, mesmo com o backend SQLite: a busca
+    # textual, as chaves de clientes/agentes e as métricas de texto usam o DataFrame
     
     # Filtros globais
     st.sidebar.title('🔍 Filtros Globais')
     
     # Filtro por Data
-    date_cols = [col for col in df.columns if any(palavra in col.lower() for palavra in ['data', 'date', 'dia', 'mes', 'ano', 'time', 'timestamp'])]
+    date_cols = detectar_colunas_data(df)
     
     # Seleção manual de coluna de data sempre disponível
     with st.sidebar.expander('📅 Selecionar Coluna de Data'):
-        colunas_data_especificas = ['DT Abertura', 'DT Conclusão']
-        colunas_data_disponiveis = [col for col in colunas_data_especificas if col in df.columns]
+        colunas_data_disponiveis = [col for col in COLUNAS_DATA_ESPECIFICAS if col in df.columns and df[col].notna().any()]
         
         coluna_data_selecionada = st.selectbox(
             'Escolha uma coluna para usar como data:',
@@ -85,9 +149,11 @@ if df is not None:
         if coluna_data_selecionada != 'Nenhuma':
             date_cols = [coluna_data_selecionada]
     
+    agente_cols = detectar_colunas_agente(df)
+    filtros = {}
+    
     if date_cols:
         with st.sidebar.expander('📅 Período'):
-            df[date_cols[0]] = pd.to_datetime(df[date_cols[0]], dayfirst=True, errors='coerce')
             data_min = df[date_cols[0]].min().date()
             data_max = df[date_cols[0]].max().date()
             
@@ -95,9 +161,9 @@ if df is not None:
             data_fim = st.date_input('Data fim', value=data_max, min_value=data_min, max_value=data_max, format='DD/MM/YYYY')
             
             df = df[(df[date_cols[0]].dt.date >= data_inicio) & (df[date_cols[0]].dt.date <= data_fim)]
+            filtros[date_cols[0]] = (data_inicio, data_fim)
     
     # Filtro por Agente Global
-    agente_cols = [col for col in df.columns if 'agente' in col.lower() or 'atendente' in col.lower()]
     if agente_cols:
         with st.sidebar.expander('👤 Agente'):
             agente_selecionado = st.selectbox(
@@ -106,6 +172,17 @@ if df is not None:
             )
             if agente_selecionado != 'Todos':
                 df = df[df[agente_cols[0]] == agente_selecionado]
+                filtros[agente_cols[0]] = agente_selecionado
+    
+    # Busca textual em Descrição e Solução (índice montado no upload)
+    termo_busca = ''
+    if 'uploaded_indice_busca' in st.session_state and st.session_state.uploaded_indice_busca.vocabulario:
+        with st.sidebar.expander('🔎 Busca em Descrição/Solução'):
+            termo_busca = st.text_input('Termos da busca', placeholder='ex.: sem sinal, troca de ONU')
+            if termo_busca.strip():
+                linhas_busca = st.session_state.uploaded_indice_busca.buscar(termo_busca)
+                df = df[df.index.isin(linhas_busca)]
+                st.caption(f'{len(df)} atendimentos encontrados')
     
     # Métricas principais (baseadas nos filtros globais)
     st.subheader("📈 Métricas Gerais")
@@ -182,31 +259,41 @@ if df is not None:
         filtro_dados = df.copy()
         
         if satisfacao_range and satisfacao_cols:
+            filtros[satisfacao_cols[0]] = satisfacao_range
             filtro_dados = filtro_dados[
                 (filtro_dados[satisfacao_cols[0]] >= satisfacao_range[0]) & 
                 (filtro_dados[satisfacao_cols[0]] <= satisfacao_range[1])
             ]
         
         if tempo_range and tempo_cols:
+            filtros[tempo_cols[0]] = tempo_range
             filtro_dados = filtro_dados[
                 (filtro_dados[tempo_cols[0]] >= tempo_range[0]) & 
                 (filtro_dados[tempo_cols[0]] <= tempo_range[1])
             ]
         
+        # Estado dos filtros que define os gráficos (a busca entra pelo termo)
+        estado = dict(filtros, busca=termo_busca)
+        
+        def top_agentes():
+            return filtro_dados[agente_cols[0]].value_counts().head(10)
+        
         # Gráficos
         col1, col2 = st.columns(2)
         
         with col1:
             if agente_cols:
                 st.subheader("Top 10 Agentes por Atendimentos")
-                top_agentes = filtro_dados[agente_cols[0]].value_counts().head(10)
-                fig = px.bar(x=top_agentes.values, y=top_agentes.index, orientation='h')
+                fig = figura_cacheada('top_agentes', assinatura, estado, lambda: barras_horizontais(top_agentes()))
                 st.plotly_chart(fig, use_container_width=True)
         
         with col2:
             if satisfacao_cols:
                 st.subheader("Distribuição de Satisfação")
-                fig = px.histogram(filtro_dados, x=satisfacao_cols[0], nbins=10)
+                fig = figura_cacheada('satisfacao', assinatura, estado, lambda: histograma_faixas(
+                    contagem_por_faixas(filtro_dados[satisfacao_cols[0]], nbins=10),
+                    titulo_x=satisfacao_cols[0]
+                ))
                 st.plotly_chart(fig, use_container_width=True)
         
         # Performance por agente
@@ -221,13 +308,44 @@ if df is not None:
                 performance['Tempo_Medio'] = filtro_dados.groupby(agente_cols[0])[tempo_cols[0]].mean()
             
             st.dataframe(performance.sort_values('Satisfacao_Media', ascending=False), use_container_width=True)
+        
+        # Cruzamento com a base de recorrência pelas chaves de cliente
+        if 'uploaded_chaves_clientes' in st.session_state:
+            chaves_atendimentos = st.session_state.uploaded_chaves_clientes.loc[filtro_dados.index]
+            recorrentes = pd.DataFrame({
+                'Chave': chaves_clientes,
+                'Cliente': df_recorrencia['Cliente'],
+                'QTD. No Periodo': df_recorrencia['QTD. No Periodo']
+            }).groupby('Chave').agg({'Cliente': 'first', 'QTD. No Periodo': 'sum'})
+            recorrentes['Atendimentos'] = contar_por_chave(recorrentes.index.to_series(), chaves_atendimentos)
+            if agente_cols and 'uploaded_chaves_agentes' in st.session_state:
+                # Pares (cliente, agente) pelas chaves dos dois índices; o nome exibido
+                # é o nome canônico do agente, não a grafia de cada planilha
+                indice_agentes_upload = st.session_state.uploaded_indice_agentes
+                pares = pd.DataFrame({
+                    'Cliente': chaves_atendimentos,
+                    'Agente': st.session_state.uploaded_chaves_agentes.loc[filtro_dados.index, agente_cols[0]]
+                })
+                pares = pares[(pares['Cliente'] >= 0) & (pares['Agente'] >= 0)].drop_duplicates()
+                atendentes = pares.groupby('Cliente')['Agente'].agg(
+                    lambda chaves: ', '.join(indice_agentes_upload.nome(chave) for chave in chaves)
+                )
+                recorrentes['Atendentes'] = recorrentes.index.map(atendentes)
+            recorrentes = recorrentes[recorrentes['Atendimentos'] > 0]
+            
+            if not recorrentes.empty:
+                st.subheader("Atendimentos de Clientes Recorrentes")
+                st.dataframe(
+                    recorrentes.sort_values(['QTD. No Periodo', 'Atendimentos'], ascending=False).reset_index(drop=True),
+                    use_container_width=True
+                )
     
     with tab2:
         st.subheader("Dados Filtrados")
         
         # Colunas específicas para exibição (baseadas no arquivo atendimento-agentes.xlsx)
         colunas_especificas = [
-            'Atendente Criador', 'Atendente', 'ID Contrato', 'Protocolo', 'Cliente', 'Tipo Geral', 'Tipo Específico', 'Descrição', 'Dt Abertura', 'Dt Conclusão', 'Solução','Cidade', 'Bairro', 'Ponto de Acesso'
+            'Atendente Criador', 'Atendente', 'ID Contrato', 'Protocolo', 'Cliente', 'Tipo Geral', 'Tipo Específico', 'Descrição', 'Dt Abertura', 'Dt Conclusão', 'Solução','Cidade', 'Bairro', 'Ponto de Acesso', 'Arquivo Origem'
             
         ]
         
@@ -1,16 +1,20 @@
 import streamlit as st
 import pandas as pd
 try:
-    import plotly.express as px
+    from graficos import figura_cacheada, barras_horizontais, pizza, barras_empilhadas
 except ImportError:
     st.error("Plotly não está instalado. Execute: pip install plotly")
     st.stop()
 from datetime import datetime, timedelta
-from utils import converter_csv, converter_excel, mensagem_sucesso
+from utils import converter_csv, converter_excel, mensagem_sucesso, carregar_arquivos, identificar_arquivos, assinatura_df, assinatura_funcoes
+from backend_sqlite import USAR_SQLITE, carregar_tabela
+from fonte_dados import FontePandas, FonteSQLite
 
 st.set_page_config(layout='wide', page_title='Entrada e Saídas dos Agentes')
 st.title('🕐 Análise de Entrada e Saídas dos Agentes')
 
+CAMINHO_PADRAO = 'dados/Acompanhamento de Atendentes - Omnidesk.csv'
+
 # Função para converter duração HH:MM:SS para minutos
 def duracao_para_minutos(duracao_str):
     if pd.isna(duracao_str) or duracao_str == "":
@@ -21,6 +25,29 @@ def duracao_para_minutos(duracao_str):
     except:
         return 0
 
+# Colunas derivadas, calculadas uma vez ao carregar os dados
+def processar_eventos(df):
+    return df.assign(
+        Duracao_Minutos=df['Duracao'].apply(duracao_para_minutos),
+        Dia=pd.to_datetime(df['Dia'], dayfirst=True, errors='coerce')
+    )
+
+# A assinatura dos dados processados combina a dos dados brutos com a do código
+# que deriva as colunas: mudar o processamento gera outra tabela no SQLite
+def carregar_eventos(df):
+    assinatura = f'{assinatura_df(df)}_{assinatura_funcoes(processar_eventos, duracao_para_minutos)}'
+    df = processar_eventos(df)
+    if USAR_SQLITE:
+        tabela = carregar_tabela('eventos', df, colunas_indice=['Dia', 'Usuario', 'Tipo Evento 1'], assinatura=assinatura)
+        return FonteSQLite(tabela), assinatura, len(df)
+    return FontePandas(df), assinatura, len(df)
+
+# Dados padrão lidos, processados (e gravados no SQLite) uma vez por processo
+@st.cache_resource(show_spinner=False)
+def eventos_padrao():
+    fonte, assinatura, _ = carregar_eventos(pd.read_csv(CAMINHO_PADRAO, sep=';'))
+    return fonte, assinatura
+
 # Opção de fonte de dados
 data_source = st.radio(
     "Escolha a fonte dos dados:",
@@ -32,33 +59,54 @@ if data_source == "📁 Upload de arquivo":
     
     # Botão para limpar dados
     if st.button("🗑️ Limpar Dados Carregados"):
-        if 'uploaded_data_entrada_saidas' in st.session_state:
-            del st.session_state.uploaded_data_entrada_saidas
+        if 'uploaded_fonte_entrada_saidas' in st.session_state:
+            del st.session_state.uploaded_fonte_entrada_saidas
+        if 'uploaded_arquivos_entrada_saidas' in st.session_state:
+            del st.session_state.uploaded_arquivos_entrada_saidas
+        if 'uploaded_assinatura_entrada_saidas' in st.session_state:
+            del st.session_state.uploaded_assinatura_entrada_saidas
         st.rerun()
     
-    uploaded_file = st.file_uploader(
-        "Faça upload do arquivo de acompanhamento de agentes (CSV ou Excel)", 
-        type=['csv', 'xlsx', 'xls']
+    uploaded_files = st.file_uploader(
+        "Faça upload dos arquivos de acompanhamento de agentes (CSV ou Excel)", 
+        type=['csv', 'xlsx', 'xls'],
+        accept_multiple_files=True
     )
     
+    # A tabela do upload pode ter sido removida pela limpeza do banco
+    if 'uploaded_fonte_entrada_saidas' in st.session_state and not st.session_state.uploaded_fonte_entrada_saidas.disponivel():
+        del st.session_state.uploaded_fonte_entrada_saidas
+        del st.session_state.uploaded_assinatura_entrada_saidas
+        st.warning("Os dados carregados expiraram. Faça o upload novamente.")
+    
+    # Arquivos no uploader diferentes dos já carregados (um arquivo foi
+    # adicionado ou removido): os dados da sessão são recarregados
+    arquivos = identificar_arquivos(uploaded_files)
+    arquivos_novos = bool(uploaded_files) and arquivos != st.session_state.get('uploaded_arquivos_entrada_saidas')
+    
     # Verificar se já existe dados na sessão
-    if 'uploaded_data_entrada_saidas' in st.session_state:
-        df = st.session_state.uploaded_data_entrada_saidas
-        st.success(f"Arquivo já carregado! {len(df)} registros encontrados.")
-    elif uploaded_file is not None:
+    if 'uploaded_fonte_entrada_saidas' in st.session_state and not arquivos_novos:
+        fonte = st.session_state.uploaded_fonte_entrada_saidas
+        assinatura = st.session_state.uploaded_assinatura_entrada_saidas
+        st.success(f"Arquivo já carregado! {fonte.contar()} registros encontrados.")
+    elif uploaded_files:
         try:
-            # Carrega o arquivo
-            if uploaded_file.name.endswith('.csv'):
-                df = pd.read_csv(uploaded_file, sep=';')
-            else:
-                df = pd.read_excel(uploaded_file)
+            # Carrega os arquivos (em paralelo quando há mais de um)
+            df = carregar_arquivos(
+                uploaded_files,
+                opcoes_csv={'sep': ';'},
+                colunas=['Usuario', 'Dia', 'Data Evento 1', 'Tipo Evento 1', 'Data Evento 2', 'Tipo Evento 2', 'Duracao']
+            )
+            fonte, assinatura, registros = carregar_eventos(df)
             
-            # Salvar na sessão
-            st.session_state.uploaded_data_entrada_saidas = df
-            st.success(f"Arquivo carregado com sucesso! {len(df)} registros encontrados.")
+            # Salvar na sessão (com o SQLite, só a referência à tabela)
+            st.session_state.uploaded_fonte_entrada_saidas = fonte
+            st.session_state.uploaded_assinatura_entrada_saidas = assinatura
+            st.session_state.uploaded_arquivos_entrada_saidas = arquivos
+            st.success(f"{len(uploaded_files)} arquivo(s) carregado(s) com sucesso! {registros} registros encontrados.")
         except Exception as e:
             st.error(f"Erro ao processar o arquivo: {str(e)}")
-            df = None
+            fonte = None
     else:
         st.info("👆 Faça upload de um arquivo para começar a análise")
         st.markdown("""
@@ -67,52 +115,55 @@ if data_source == "📁 Upload de arquivo":
         - Colunas: Usuario, Dia, Data Evento 1, Tipo Evento 1, Data Evento 2, Tipo Evento 2, Duracao
         - Representa logs de mudanças de status dos atendentes
         """)
-        df = None
+        fonte = None
 else:
     # Carregar dados padrão
     try:
-        df = pd.read_csv('dados/Acompanhamento de Atendentes - Omnidesk.csv', sep=';')
-        st.success(f"Dados padrão carregados! {len(df)} registros encontrados.")
+        fonte, assinatura = eventos_padrao()
+        if not fonte.disponivel():
+            eventos_padrao.clear()
+            fonte, assinatura = eventos_padrao()
+        registros = fonte.contar()
+        st.success(f"Dados padrão carregados! {registros} registros encontrados.")
     except:
         st.info("💾 Dados padrão não disponíveis. Faça upload de um arquivo.")
-        df = None
+        fonte = None
 
-if df is not None:
-    # Processamento dos dados
-    df['Duracao_Minutos'] = df['Duracao'].apply(duracao_para_minutos)
-    df['Dia'] = pd.to_datetime(df['Dia'], dayfirst=True, errors='coerce')
+if fonte is not None:
+    filtros = {}
     
     # Filtros globais
     st.sidebar.title('🔍 Filtros Globais')
     
     # Filtro por período
     with st.sidebar.expander('📅 Período'):
-        data_min = df['Dia'].min().date()
-        data_max = df['Dia'].max().date()
+        periodo = fonte.agregar([], {'Inicio': ('min', 'Dia'), 'Fim': ('max', 'Dia')}).iloc[0]
+        data_min = pd.Timestamp(periodo['Inicio']).date()
+        data_max = pd.Timestamp(periodo['Fim']).date()
         
         data_inicio = st.date_input('Data início', value=data_min, min_value=data_min, max_value=data_max, format='DD/MM/YYYY')
         data_fim = st.date_input('Data fim', value=data_max, min_value=data_min, max_value=data_max, format='DD/MM/YYYY')
         
-        df_filtrado = df[(df['Dia'].dt.date >= data_inicio) & (df['Dia'].dt.date <= data_fim)]
+        filtros['Dia'] = (data_inicio, data_fim)
     
     # Filtro por usuário
     with st.sidebar.expander('👤 Usuário'):
         usuario_selecionado = st.selectbox(
             'Selecione um usuário específico (opcional)',
-            ['Todos'] + list(df_filtrado['Usuario'].unique())
+            ['Todos'] + fonte.distintos('Usuario', filtros)
         )
         if usuario_selecionado != 'Todos':
-            df_filtrado = df_filtrado[df_filtrado['Usuario'] == usuario_selecionado]
+            filtros['Usuario'] = usuario_selecionado
     
     # Filtro por tipo de evento
     with st.sidebar.expander('📊 Tipo de Status'):
-        tipos_evento = df_filtrado['Tipo Evento 1'].unique()
+        tipos_evento = fonte.distintos('Tipo Evento 1', filtros)
         tipos_selecionados = st.multiselect(
             'Selecione os tipos de status',
             tipos_evento,
             default=tipos_evento
         )
-        df_filtrado = df_filtrado[df_filtrado['Tipo Evento 1'].isin(tipos_selecionados)]
+        filtros['Tipo Evento 1'] = tipos_selecionados
     
     # Métricas principais
     st.subheader("📈 Métricas Gerais")
@@ -120,7 +171,9 @@ if df is not None:
         st.info(f"📊 Métricas para o usuário: **{usuario_selecionado}**")
     
     # Calcular métricas por tipo de evento
-    metricas_por_tipo = df_filtrado.groupby('Tipo Evento 1')['Duracao_Minutos'].sum()
+    metricas_por_tipo = fonte.agregar(
+        ['Tipo Evento 1'], {'Duracao_Minutos': ('sum', 'Duracao_Minutos')}, filtros
+    ).set_index('Tipo Evento 1')['Duracao_Minutos']
     
     col1, col2, col3, col4, col5 = st.columns(5)
     
@@ -143,8 +196,8 @@ if df is not None:
         st.metric("% Tempo Produtivo", f"{percentual_produtivo:.1f}%")
     
     with col5:
-        usuarios_unicos = df_filtrado['Usuario'].nunique()
-        st.metric("Usuários Únicos", usuarios_unicos)
+        usuarios_unicos = fonte.agregar([], {'Usuarios': ('nunique', 'Usuario')}, filtros)['Usuarios'].iloc[0]
+        st.metric("Usuários Únicos", int(usuarios_unicos))
     
     # Análises
     tab1, tab2, tab3 = st.tabs(['📊 Análise Detalhada', '📋 Dados Filtrados', '📥 Download'])
@@ -154,27 +207,29 @@ if df is not None:
         
         with col1:
             st.subheader("Tempo Total por Status")
-            fig_status = px.bar(
-                x=metricas_por_tipo.values,
-                y=metricas_por_tipo.index,
-                orientation='h',
-                title="Distribuição de Tempo por Status"
-            )
-            fig_status.update_layout(xaxis_title="Tempo (minutos)", yaxis_title="Status")
+            fig_status = figura_cacheada('tempo_status', assinatura, filtros, lambda: barras_horizontais(
+                metricas_por_tipo,
+                title="Distribuição de Tempo por Status",
+                xaxis_title="Tempo (minutos)",
+                yaxis_title="Status"
+            ))
             st.plotly_chart(fig_status, use_container_width=True)
         
         with col2:
             st.subheader("Proporção dos Status")
-            fig_pie = px.pie(
-                values=metricas_por_tipo.values,
-                names=metricas_por_tipo.index,
+            fig_pie = figura_cacheada('proporcao_status', assinatura, filtros, lambda: pizza(
+                metricas_por_tipo,
                 title="Proporção de Tempo por Status"
-            )
+            ))
             st.plotly_chart(fig_pie, use_container_width=True)
         
         # Análise por usuário
         st.subheader("Performance por Usuário")
-        performance_usuario = df_filtrado.groupby(['Usuario', 'Tipo Evento 1'])['Duracao_Minutos'].sum().unstack(fill_value=0)
+        performance_usuario = fonte.agregar(
+            ['Usuario', 'Tipo Evento 1'], {'Duracao_Minutos': ('sum', 'Duracao_Minutos')}, filtros
+        ).set_index(['Usuario', 'Tipo Evento 1'])['Duracao_Minutos'].unstack(fill_value=0)
+        
+        colunas_status = list(performance_usuario.columns)
         
         if not performance_usuario.empty:
             # Calcular totais e percentuais
@@ -185,37 +240,47 @@ if df is not None:
             
             st.dataframe(performance_usuario.sort_values('Total', ascending=False), use_container_width=True)
             
-            # Gráfico stacked por usuário
+            # Gráfico stacked por usuário (reaproveita o agrupamento da tabela acima)
             st.subheader("Distribuição de Tempo por Usuário")
-            fig_stacked = px.bar(
-                df_filtrado.groupby(['Usuario', 'Tipo Evento 1'])['Duracao_Minutos'].sum().reset_index(),
+            fig_stacked = figura_cacheada('tempo_usuario_status', assinatura, filtros, lambda: barras_empilhadas(
+                performance_usuario[colunas_status].stack().rename('Duracao_Minutos').reset_index(),
                 x='Usuario',
                 y='Duracao_Minutos',
-                color='Tipo Evento 1',
-                title="Tempo por Status por Usuário"
-            )
-            fig_stacked.update_layout(xaxis_title="Usuário", yaxis_title="Tempo (minutos)")
+                cor='Tipo Evento 1',
+                title="Tempo por Status por Usuário",
+                xaxis_title="Usuário",
+                yaxis_title="Tempo (minutos)"
+            ))
             st.plotly_chart(fig_stacked, use_container_width=True)
     
     with tab2:
         st.subheader("Dados Filtrados")
         
         # Colunas para exibição
-        colunas_exibicao = ['Usuario', 'Dia', 'Data Evento 1', 'Tipo Evento 1', 'Data Evento 2', 'Tipo Evento 2', 'Duracao', 'Duracao_Minutos']
-        colunas_disponiveis = [col for col in colunas_exibicao if col in df_filtrado.columns]
+        colunas_exibicao = ['Usuario', 'Dia', 'Data Evento 1', 'Tipo Evento 1', 'Data Evento 2', 'Tipo Evento 2', 'Duracao', 'Duracao_Minutos', 'Arquivo Origem']
+        colunas_disponiveis = [col for col in colunas_exibicao if col in fonte.colunas]
+        
+        # Com o SQLite, só a página exibida é lida do banco
+        total_filtrado = fonte.contar(filtros)
+        deslocamento = 0
+        if fonte.tamanho_pagina and total_filtrado > fonte.tamanho_pagina:
+            paginas = -(-total_filtrado // fonte.tamanho_pagina)
+            pagina = st.number_input(f'Página (de {paginas})', min_value=1, max_value=paginas, value=1)
+            deslocamento = (pagina - 1) * fonte.tamanho_pagina
         
-        st.dataframe(df_filtrado[colunas_disponiveis], use_container_width=True)
-        st.markdown(f'A tabela possui **{df_filtrado.shape[0]}** linhas e **{df_filtrado.shape[1]}** colunas')
+        st.dataframe(fonte.linhas(filtros, colunas_disponiveis, fonte.tamanho_pagina, deslocamento), use_container_width=True)
+        st.markdown(f'A tabela possui **{total_filtrado}** linhas e **{len(fonte.colunas)}** colunas')
     
     with tab3:
         st.subheader("Download dos Dados")
         nome_arquivo = st.text_input('Nome do arquivo', value='entrada_saidas')
         
+        # Arquivos gerados só quando o botão é clicado
         col1, col2 = st.columns(2)
         with col1:
             st.download_button(
                 '📥 Download CSV',
-                data=converter_csv(df_filtrado),
+                data=lambda: converter_csv(fonte.linhas(filtros)),
                 file_name=f'{nome_arquivo}.csv',
                 mime='text/csv',
                 on_click=mensagem_sucesso
@@ -224,7 +289,7 @@ if df is not None:
         with col2:
             st.download_button(
                 '📥 Download Excel',
-                data=converter_excel(df_filtrado),
+                data=lambda: converter_excel(fonte.linhas(filtros)),
                 file_name=f'{nome_arquivo}.xlsx',
                 mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
                 on_click=mensagem_sucesso
@@ -1,12 +1,28 @@
 import streamlit as st
-from dataset import df as df_default
+from dataset import df as df_default, assinatura_recorrencia, fonte_recorrencia, COLUNAS_INDICE_RECORRENCIA
 import pandas as pd
-import plotly.express as px
-from utils import converter_csv, converter_excel, mensagem_sucesso
+from utils import converter_csv, converter_excel, mensagem_sucesso, carregar_arquivos, identificar_arquivos, assinatura_df
+from graficos import figura_cacheada, barras_horizontais
+from functools import reduce
+from rastreador_top import criar_rastreadores, mesclar_rastreadores
+from backend_sqlite import USAR_SQLITE, carregar_tabela
+from fonte_dados import FontePandas, FonteSQLite
 
 st.set_page_config(layout='wide', page_title='Recorrência de Demandas')
 st.title('📊 Análise de Recorrência de Demandas')
 
+# Rastreadores de frequência calculados uma vez por conjunto de dados (chave: assinatura).
+# Com vários arquivos, cada um gera seus resumos e eles são mesclados.
+@st.cache_resource(show_spinner=False, max_entries=16)
+def rastreadores_por_dados(assinatura, _df):
+    if _df is None:
+        # Dados só no SQLite e resumos fora do cache: as páginas usam as agregações do banco
+        return {}
+    if 'Arquivo Origem' in _df.columns:
+        partes = [criar_rastreadores(parte) for _, parte in _df.groupby('Arquivo Origem', sort=False)]
+        return reduce(mesclar_rastreadores, partes)
+    return criar_rastreadores(_df)
+
 # Opção de fonte de dados
 data_source = st.radio(
     "Escolha a fonte dos dados:",
@@ -15,23 +31,63 @@ data_source = st.radio(
 
 if data_source == "📁 Upload de arquivo":
     st.subheader("📁 Upload de Dados")
-    uploaded_file = st.file_uploader(
-        "Faça upload do arquivo de demandas (CSV ou Excel)", 
-        type=['csv', 'xlsx', 'xls']
+    
+    # Botão para limpar dados
+    if st.button("🗑️ Limpar Dados Carregados"):
+        if 'uploaded_fonte_recorrencia' in st.session_state:
+            del st.session_state.uploaded_fonte_recorrencia
+        if 'uploaded_arquivos_recorrencia' in st.session_state:
+            del st.session_state.uploaded_arquivos_recorrencia
+        if 'uploaded_assinatura_recorrencia' in st.session_state:
+            del st.session_state.uploaded_assinatura_recorrencia
+        st.rerun()
+    
+    uploaded_files = st.file_uploader(
+        "Faça upload dos arquivos de demandas (CSV ou Excel)", 
+        type=['csv', 'xlsx', 'xls'],
+        accept_multiple_files=True
     )
     
-    if uploaded_file is not None:
+    # A tabela do upload pode ter sido removida pela limpeza do banco
+    if 'uploaded_fonte_recorrencia' in st.session_state and not st.session_state.uploaded_fonte_recorrencia.disponivel():
+        del st.session_state.uploaded_fonte_recorrencia
+        del st.session_state.uploaded_assinatura_recorrencia
+        st.warning("Os dados carregados expiraram. Faça o upload novamente.")
+    
+    # Arquivos no uploader diferentes dos já carregados (um arquivo foi
+    # adicionado ou removido): os dados da sessão são recarregados
+    arquivos = identificar_arquivos(uploaded_files)
+    arquivos_novos = bool(uploaded_files) and arquivos != st.session_state.get('uploaded_arquivos_recorrencia')
+    
+    # Verificar se já existe dados na sessão
+    if 'uploaded_fonte_recorrencia' in st.session_state and not arquivos_novos:
+        fonte = st.session_state.uploaded_fonte_recorrencia
+        assinatura = st.session_state.uploaded_assinatura_recorrencia
+        df = getattr(fonte, 'df', None)
+        st.success(f"Arquivo já carregado! {fonte.contar()} registros encontrados.")
+    elif uploaded_files:
         try:
-            # Carrega o arquivo
-            if uploaded_file.name.endswith('.csv'):
-                df = pd.read_csv(uploaded_file)
+            # Carrega os arquivos (em paralelo quando há mais de um)
+            df = carregar_arquivos(uploaded_files, colunas=list(df_default.columns))
+            assinatura = assinatura_df(df)
+            
+            # Com o SQLite, os dados são gravados uma vez aqui e a sessão guarda só a tabela
+            if USAR_SQLITE:
+                fonte = FonteSQLite(carregar_tabela(
+                    'recorrencia', df, colunas_indice=COLUNAS_INDICE_RECORRENCIA, assinatura=assinatura
+                ))
             else:
-                df = pd.read_excel(uploaded_file)
+                fonte = FontePandas(df)
+            rastreadores_por_dados(assinatura, df)
             
-            st.success(f"Arquivo carregado com sucesso! {len(df)} registros encontrados.")
+            # Salvar na sessão
+            st.session_state.uploaded_fonte_recorrencia = fonte
+            st.session_state.uploaded_assinatura_recorrencia = assinatura
+            st.session_state.uploaded_arquivos_recorrencia = arquivos
+            st.success(f"{len(uploaded_files)} arquivo(s) carregado(s) com sucesso! {len(df)} registros encontrados.")
         except Exception as e:
             st.error(f"Erro ao processar o arquivo: {str(e)}")
-            df = None
+            fonte = None
     else:
         st.info("👆 Faça upload de um arquivo para começar a análise")
         st.markdown("""
@@ -40,34 +96,51 @@ if data_source == "📁 Upload de arquivo":
         - Colunas sugeridas: Cliente, Tipo de Solicitação, Categoria, Data, Quantidade
         - Primeira linha deve conter os cabeçalhos
         """)
-        df = None
+        fonte = None
 else:
+    fonte = fonte_recorrencia()
     df = df_default
+    assinatura = assinatura_recorrencia
     st.success(f"Dados padrão carregados! {len(df)} registros encontrados.")
 
-if df is not None:
+if fonte is not None:
+    colunas_dados = fonte.colunas
+    
+    # Totais calculados em uma única agregação (no banco, com o backend SQLite)
+    totais = {}
+    if 'QTD. No Periodo' in colunas_dados:
+        totais['Total de Demandas'] = ('sum', 'QTD. No Periodo')
+        totais['QTD_Min'] = ('min', 'QTD. No Periodo')
+        totais['QTD_Max'] = ('max', 'QTD. No Periodo')
+    if 'Cliente' in colunas_dados:
+        totais['Clientes Únicos'] = ('nunique', 'Cliente')
+    if 'Tipo de Solicitação' in colunas_dados:
+        totais['Tipos de Solicitação'] = ('nunique', 'Tipo de Solicitação')
+    totais = fonte.agregar([], totais).iloc[0] if totais else pd.Series(dtype=object)
+    total_registros = fonte.contar()
+    
     # Métricas principais
     st.subheader("📈 Métricas Gerais")
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("Total de Registros", len(df))
+        st.metric("Total de Registros", total_registros)
     
     with col2:
-        if 'QTD. No Periodo' in df.columns:
-            st.metric("Total de Demandas", int(df['QTD. No Periodo'].sum()))
+        if 'Total de Demandas' in totais:
+            st.metric("Total de Demandas", int(0 if pd.isna(totais['Total de Demandas']) else totais['Total de Demandas']))
         else:
             st.metric("Total de Demandas", "N/A")
     
     with col3:
-        if 'Cliente' in df.columns:
-            st.metric("Clientes Únicos", df['Cliente'].nunique())
+        if 'Clientes Únicos' in totais:
+            st.metric("Clientes Únicos", int(totais['Clientes Únicos']))
         else:
             st.metric("Clientes Únicos", "N/A")
     
     with col4:
-        if 'Tipo de Solicitação' in df.columns:
-            st.metric("Tipos de Solicitação", df['Tipo de Solicitação'].nunique())
+        if 'Tipos de Solicitação' in totais:
+            st.metric("Tipos de Solicitação", int(totais['Tipos de Solicitação']))
         else:
             st.metric("Tipos de Solicitação", "N/A")
     
@@ -78,90 +151,128 @@ if df is not None:
         with st.expander('Colunas'):
             colunas = st.multiselect(
                 'Selecione as colunas',
-                list(df.columns),
-                list(df.columns)
+                colunas_dados,
+                colunas_dados
             )
         
         st.sidebar.title('🔍 Filtros')
         
-        if 'Cliente' in df.columns:
+        if 'Cliente' in colunas_dados:
             with st.sidebar.expander('Cliente'):
                 clientes = st.multiselect(
                     'Selecione os clientes',
-                    df['Cliente'].unique(),
+                    fonte.distintos('Cliente'),
                     []
                 )
         else:
             clientes = []
         
-        if 'Tipo de Solicitação' in df.columns:
+        if 'Tipo de Solicitação' in colunas_dados:
             with st.sidebar.expander('Tipo de Solicitação'):
                 solicitacoes = st.multiselect(
                     'Selecione os tipos',
-                    df['Tipo de Solicitação'].unique(),
+                    fonte.distintos('Tipo de Solicitação'),
                     []
                 )
         else:
             solicitacoes = []
         
-        if 'QTD. No Periodo' in df.columns:
+        if 'QTD_Min' in totais and pd.notna(totais['QTD_Min']):
             with st.sidebar.expander('Quantidade no Período'):
                 qtd_periodo = st.slider(
                     'Selecione a quantidade',
-                    int(df['QTD. No Periodo'].min()), 
-                    int(df['QTD. No Periodo'].max()), 
-                    (int(df['QTD. No Periodo'].min()), int(df['QTD. No Periodo'].max()))
+                    int(totais['QTD_Min']), 
+                    int(totais['QTD_Max']), 
+                    (int(totais['QTD_Min']), int(totais['QTD_Max']))
                 )
         else:
             qtd_periodo = None
         
         # Aplicar filtros
-        filtro_dados = df.copy()
+        filtros = {}
+        
+        if clientes:
+            filtros['Cliente'] = clientes
         
-        if clientes and 'Cliente' in df.columns:
-            filtro_dados = filtro_dados[filtro_dados['Cliente'].isin(clientes)]
+        if solicitacoes:
+            filtros['Tipo de Solicitação'] = solicitacoes
         
-        if solicitacoes and 'Tipo de Solicitação' in df.columns:
-            filtro_dados = filtro_dados[filtro_dados['Tipo de Solicitação'].isin(solicitacoes)]
+        if qtd_periodo:
+            filtros['QTD. No Periodo'] = qtd_periodo
         
-        if qtd_periodo and 'QTD. No Periodo' in df.columns:
-            filtro_dados = filtro_dados[
-                (filtro_dados['QTD. No Periodo'] >= qtd_periodo[0]) & 
-                (filtro_dados['QTD. No Periodo'] <= qtd_periodo[1])
-            ]
+        total_filtrado = fonte.contar(filtros)
+        
+        # Sem filtros ativos, os tops vêm direto dos rastreadores
+        rastreadores = rastreadores_por_dados(assinatura, df) if total_filtrado == total_registros else {}
+        
+        def top_10(coluna):
+            if coluna in rastreadores:
+                return rastreadores[coluna].top(10).set_index('Item')['Contagem']
+            top = fonte.agregar([coluna], {'Total': ('count', coluna)}, filtros, ordenar_por='Total', limite=10)
+            return top.set_index(coluna)['Total']
         
         # Gráficos
         col1, col2 = st.columns(2)
         
         with col1:
-            if 'Tipo de Solicitação' in filtro_dados.columns:
+            if 'Tipo de Solicitação' in colunas_dados:
                 st.subheader("Top 10 Tipos de Solicitação")
-                top_solicitacoes = filtro_dados['Tipo de Solicitação'].value_counts().head(10)
-                fig = px.bar(x=top_solicitacoes.values, y=top_solicitacoes.index, orientation='h')
-                st.plotly_chart(fig, use_container_width=True)
+                fig = figura_cacheada(
+                    'top_solicitacoes', assinatura, filtros,
+                    lambda: barras_horizontais(top_10('Tipo de Solicitação'))
+                )
+                st.plotly_chart(fig, use_container_width=True, key='top_solicitacoes')
         
         with col2:
-            if 'Cliente' in filtro_dados.columns:
+            if 'Cliente' in colunas_dados:
                 st.subheader("Top 10 Clientes")
-                top_clientes = filtro_dados['Cliente'].value_counts().head(10)
-                fig = px.bar(x=top_clientes.values, y=top_clientes.index, orientation='h')
-                st.plotly_chart(fig, use_container_width=True)
+                fig = figura_cacheada(
+                    'top_clientes', assinatura, filtros,
+                    lambda: barras_horizontais(top_10('Cliente'))
+                )
+                st.plotly_chart(fig, use_container_width=True, key='top_clientes')
+        
+        col3, col4 = st.columns(2)
+        
+        with col3:
+            if 'Categoria 1' in colunas_dados:
+                st.subheader("Top 10 Categorias")
+                fig = figura_cacheada(
+                    'top_categorias', assinatura, filtros,
+                    lambda: barras_horizontais(top_10('Categoria 1'))
+                )
+                st.plotly_chart(fig, use_container_width=True, key='top_categorias')
+        
+        with col4:
+            if 'Matriz' in colunas_dados:
+                st.subheader("Top 10 Matrizes")
+                fig = figura_cacheada(
+                    'top_matrizes', assinatura, filtros,
+                    lambda: barras_horizontais(top_10('Matriz'))
+                )
+                st.plotly_chart(fig, use_container_width=True, key='top_matrizes')
     
     with tab2:
         st.subheader("Dados Filtrados")
-        filtro_dados_display = filtro_dados[colunas] if 'colunas' in locals() else filtro_dados
-        st.dataframe(filtro_dados_display, use_container_width=True)
-        st.markdown(f'A tabela possui **{filtro_dados_display.shape[0]}** linhas e **{filtro_dados_display.shape[1]}** colunas')
+        # Com o SQLite, só a página exibida é lida do banco
+        deslocamento = 0
+        if fonte.tamanho_pagina and total_filtrado > fonte.tamanho_pagina:
+            paginas = -(-total_filtrado // fonte.tamanho_pagina)
+            pagina = st.number_input(f'Página (de {paginas})', min_value=1, max_value=paginas, value=1)
+            deslocamento = (pagina - 1) * fonte.tamanho_pagina
+        st.dataframe(fonte.linhas(filtros, colunas, fonte.tamanho_pagina, deslocamento), use_container_width=True)
+        st.markdown(f'A tabela possui **{total_filtrado}** linhas e **{len(colunas)}** colunas')
     
     with tab3:
         st.subheader("Download dos Dados")
         nome_arquivo = st.text_input('Nome do arquivo', value='demandas')
         
+        # Arquivos gerados só quando o botão é clicado
         col1, col2 = st.columns(2)
         with col1:
             st.download_button(
                 '📥 Download CSV',
-                data=converter_csv(filtro_dados_display),
+                data=lambda: converter_csv(fonte.linhas(filtros, colunas)),
                 file_name=f'{nome_arquivo}.csv',
                 mime='text/csv',
                 on_click=mensagem_sucesso
@@ -170,7 +281,7 @@ if df is not None:
         with col2:
             st.download_button(
                 '📥 Download Excel',
-                data=converter_excel(filtro_dados_display),
+                data=lambda: converter_excel(fonte.linhas(filtros, colunas)),
                 file_name=f'{nome_arquivo}.xlsx',
                 mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
                 on_click=mensagem_sucesso
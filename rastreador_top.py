@@ -0,0 +1,118 @@
+import heapq
+from itertools import count
+import pandas as pd
+
+# Dimensões acompanhadas no arquivo de recorrência
+DIMENSOES_RECORRENCIA = ['Cliente', 'Tipo de Solicitação', 'Categoria 1', 'Matriz']
+
+
+# Contador aproximado dos itens mais frequentes (algoritmo Space-Saving).
+# Usa memória limitada a `capacidade` itens; para cada item guarda a contagem
+# estimada e o erro máximo, de forma que: contagem - erro <= real <= contagem.
+# Se o número de itens distintos não passa da capacidade, as contagens são exatas.
+class RastreadorTop:
+    def __init__(self, capacidade=5000):
+        self.capacidade = capacidade
+        self.contagens = {}
+        self.erros = {}
+        self.total = 0
+        # Entradas (contagem, sequência, item): a sequência desempata sem comparar
+        # os itens, que podem misturar tipos (ex.: str e int de uma planilha)
+        self._heap = []
+        self._sequencia = count()
+
+    def __len__(self):
+        return len(self.contagens)
+
+    def atualizar(self, item, peso=1):
+        if pd.isna(item) or peso <= 0:
+            return
+        self.total += peso
+        if item in self.contagens:
+            self.contagens[item] += peso
+        elif len(self.contagens) < self.capacidade:
+            self.contagens[item] = peso
+            self.erros[item] = 0
+        else:
+            # Substitui o item de menor contagem, herdando a contagem dele como erro
+            minimo = self._remover_minimo()
+            self.contagens[item] = minimo + peso
+            self.erros[item] = minimo
+        heapq.heappush(self._heap, (self.contagens[item], next(self._sequencia), item))
+        if len(self._heap) > 4 * self.capacidade:
+            self._compactar_heap()
+
+    def atualizar_serie(self, valores, pesos=None):
+        # Pré-agrega o lote antes de atualizar (atualização ponderada equivalente)
+        if pesos is None:
+            lote = pd.Series(valores).value_counts(sort=False)
+        else:
+            lote = pd.Series(pd.Series(pesos).to_numpy(), index=pd.Index(valores)).groupby(level=0).sum()
+        for item, peso in lote.items():
+            self.atualizar(item, peso)
+        return self
+
+    def mesclar(self, outro):
+        # União de dois resumos: itens ausentes em um dos lados recebem a menor
+        # contagem daquele lado (quando cheio) como contagem e erro adicionais.
+        minimo_a = self._minimo() if len(self) >= self.capacidade else 0
+        minimo_b = outro._minimo() if len(outro) >= outro.capacidade else 0
+
+        contagens = {}
+        erros = {}
+        for item in set(self.contagens) | set(outro.contagens):
+            contagens[item] = self.contagens.get(item, minimo_a) + outro.contagens.get(item, minimo_b)
+            erros[item] = self.erros.get(item, minimo_a) + outro.erros.get(item, minimo_b)
+
+        resultado = RastreadorTop(max(self.capacidade, outro.capacidade))
+        mantidos = heapq.nlargest(resultado.capacidade, contagens, key=contagens.get)
+        resultado.contagens = {item: contagens[item] for item in mantidos}
+        resultado.erros = {item: erros[item] for item in mantidos}
+        resultado.total = self.total + outro.total
+        resultado._compactar_heap()
+        return resultado
+
+    def top(self, k=10):
+        itens = heapq.nlargest(k, self.contagens, key=self.contagens.get)
+        return pd.DataFrame({
+            'Item': itens,
+            'Contagem': [self.contagens[item] for item in itens],
+            'Erro_Maximo': [self.erros[item] for item in itens],
+        })
+
+    def _minimo(self):
+        self._limpar_topo()
+        return self._heap[0][0] if self._heap else 0
+
+    def _remover_minimo(self):
+        self._limpar_topo()
+        contagem, _, item = heapq.heappop(self._heap)
+        del self.contagens[item]
+        del self.erros[item]
+        return contagem
+
+    def _limpar_topo(self):
+        # Descarta entradas antigas do heap (contagem já atualizada ou item removido)
+        while self._heap and self.contagens.get(self._heap[0][2]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def _compactar_heap(self):
+        self._heap = [(contagem, next(self._sequencia), item) for item, contagem in self.contagens.items()]
+        heapq.heapify(self._heap)
+
+
+def criar_rastreadores(df, dimensoes=DIMENSOES_RECORRENCIA, coluna_peso=None, capacidade=5000):
+    rastreadores = {}
+    for dimensao in dimensoes:
+        if dimensao not in df.columns:
+            continue
+        pesos = df[coluna_peso].fillna(0) if coluna_peso else None
+        rastreadores[dimensao] = RastreadorTop(capacidade).atualizar_serie(df[dimensao], pesos)
+    return rastreadores
+
+
+def mesclar_rastreadores(a, b):
+    resultado = dict(a)
+    for dimensao, rastreador in b.items():
+        resultado[dimensao] = resultado[dimensao].mesclar(rastreador) if dimensao in resultado else rastreador
+    return resultado
@@ -1,6 +1,25 @@
+import os
+import hashlib
+import inspect
+import multiprocessing
 import streamlit as st
 import pandas as pd
 from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from leitura import ler_arquivo
+
+# Identificador do conteúdo de um DataFrame, incluindo os nomes das colunas
+# (usado como chave de cache e de tabela)
+def assinatura_df(df):
+    valores = int(pd.util.hash_pandas_object(df, index=True).sum())
+    colunas = int(pd.util.hash_pandas_object(pd.Series(df.columns.astype(str)), index=True).sum())
+    return format((valores ^ colunas * 31) & 0xFFFFFFFFFFFFFFFF, '016x')
+
+# Identificador do código das funções que derivam colunas dos dados brutos:
+# se o processamento muda, a assinatura dos dados derivados também muda
+def assinatura_funcoes(*funcoes):
+    codigo = ''.join(inspect.getsource(funcao) for funcao in funcoes)
+    return hashlib.sha1(codigo.encode('utf-8')).hexdigest()[:8]
 
 def converter_csv(df):
     return df.to_csv(index=False).encode('utf-8')
@@ -12,4 +31,34 @@ def converter_excel(df):
     return output.getvalue()
 
 def mensagem_sucesso():
-    st.success('Download realizado com sucesso!')
\ No newline at end of file
+    st.success('Download realizado com sucesso!')
+
+# Identifica o conjunto de arquivos do uploader: muda quando um arquivo é
+# adicionado, removido ou enviado de novo
+def identificar_arquivos(arquivos):
+    return tuple(arquivo.file_id for arquivo in arquivos or [])
+
+# Lê vários arquivos enviados em paralelo (um processo por arquivo), alinha as
+# colunas ao esquema da página e concatena uma única vez, marcando a origem
+def carregar_arquivos(arquivos, opcoes_csv=None, colunas=None, coluna_origem='Arquivo Origem'):
+    nomes = [arquivo.name for arquivo in arquivos]
+    conteudos = [arquivo.getvalue() for arquivo in arquivos]
+    
+    if len(arquivos) == 1:
+        tabelas = [ler_arquivo(nomes[0], conteudos[0], opcoes_csv)]
+    else:
+        # Processos novos (forkserver/spawn) em vez de fork: o servidor do Streamlit
+        # tem várias threads e um fork pode herdar uma trava ocupada
+        metodo = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        with ProcessPoolExecutor(
+            max_workers=min(len(arquivos), os.cpu_count() or 1), mp_context=multiprocessing.get_context(metodo)
+        ) as executor:
+            tabelas = list(executor.map(ler_arquivo, nomes, conteudos, [opcoes_csv] * len(arquivos)))
+    
+    # Colunas na ordem em que aparecem nos arquivos; as do esquema que nenhum
+    # arquivo tem entram vazias no final
+    ordem = list(dict.fromkeys(col for tabela in tabelas for col in tabela.columns))
+    ordem += [col for col in (colunas or []) if col not in ordem]
+    
+    tabelas = [tabela.reindex(columns=ordem).assign(**{coluna_origem: nome}) for tabela, nome in zip(tabelas, nomes)]
+    return pd.concat(tabelas, ignore_index=True)